@@ -1,93 +1,170 @@
 """
 Conversation and Health API endpoints.
 """
-from fastapi import APIRouter
-import uuid
-import json as json_lib
+from fastapi import APIRouter, Depends, Response
+from google.api_core import exceptions as google_exceptions
+import asyncio
+import os
 
+from app.api.deps import json_body, json_body_openapi
 from app.models import ConversationRequest, ConversationResponse, Action
-from app.core.prompts import SYSTEM_PROMPT
+from app.core import json
 from app.core.logging import logger
 from app.services import conversation as conv_service
+from app.services import elevenlabs as tts_service
 from app.services import gemini as gemini_service
+from app.services.dom import compact_dom, limit_elements
 
 router = APIRouter()
 
+# Static reply for empty transcripts, serialized once at import
+_EMPTY_TRANSCRIPT_BODY = ConversationResponse(
+    response="I didn't catch that. Could you repeat?",
+    actions=None,
+    completed=True
+).model_dump_json().encode()
+
+# Actions that change the page (the extension's "mutative" category); replies carrying
+# them are never replayed from the reply cache
+_MUTATIVE_ACTIONS = frozenset({
+    "click", "type", "scroll", "navigate", "open_tab", "close_tab", "switch_tab", "go_back", "reload",
+})
+
+_PROMPT_INSTRUCTION = "\n\nAnalyze the request and context. Respond with JSON based on the System Protocol."
+
+# Strong references to fire-and-forget tasks (the event loop only keeps weak ones)
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _run_in_background(coro) -> asyncio.Task:
+    """Schedule coro without requiring an await; failures are logged, not raised."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_done)
+    return task
+
+
+def _on_background_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background task failed: %s", task.exception())
+
+
+def _to_actions(raw_actions) -> list[Action]:
+    """
+    Build Action objects from Gemini's parsed JSON.
+    The shape is checked here (Action is a plain dataclass, so no validation runs);
+    malformed entries are dropped and logged rather than guessed at.
+    """
+    if raw_actions is None:
+        return []
+    if not isinstance(raw_actions, list):
+        logger.warning("Dropping malformed actions (not a list): %r", raw_actions)
+        return []
+    actions = []
+    for act in raw_actions:
+        if not isinstance(act, dict) or not isinstance(act.get("type"), str):
+            logger.warning("Dropping malformed action: %r", act)
+            continue
+        args = act.get("args")
+        if args is None:
+            args = {}  # Argument-less actions (e.g. go_back) may omit args
+        elif not isinstance(args, dict):
+            logger.warning("Dropping %s action with malformed args: %r", act["type"], args)
+            continue
+        actions.append(Action(type=act["type"], args=args))
+    return actions
+
+
+def _error_response(error: Exception, conversation_id: str) -> ConversationResponse:
+    """Reply telling the user the turn failed."""
+    return ConversationResponse.model_construct(
+        response=f"I had a problem processing that. Error: {str(error) or type(error).__name__}",
+        actions=None,
+        completed=True,
+        conversation_id=conversation_id
+    )
+
 
 @router.get("/health")
 async def health():
     """Health check endpoint."""
-    model = gemini_service.get_model()
-    return {"status": "ok", "gemini": model is not None}
+    return {"status": "ok", "gemini": gemini_service.IS_READY}
 
 
-@router.post("/conversation", response_model=ConversationResponse)
-async def conversation(request: ConversationRequest):
+@router.post(
+    "/conversation",
+    response_model=ConversationResponse,
+    openapi_extra=json_body_openapi(ConversationRequest),
+)
+async def conversation(request: ConversationRequest = Depends(json_body(ConversationRequest))):
     """
     Process user transcript with Gemini, return response + actions.
     """
     user_text = request.transcript.strip()
 
     if not user_text:
-        return ConversationResponse(
-            response="I didn't catch that. Could you repeat?",
-            actions=None,
-            completed=True
-        )
+        return Response(content=_EMPTY_TRANSCRIPT_BODY, media_type="application/json")
 
-    # Get Gemini model/service status
-    model = gemini_service.get_model()
-    if not model:
-        return ConversationResponse(
+    # Check Gemini service status
+    if not gemini_service.IS_READY:
+        return ConversationResponse.model_construct(
             response=f"Gemini not configured. You said: {user_text}",
             actions=None,
             completed=True
         )
 
-    candidate_id = request.conversation_id or str(uuid.uuid4())
-    
-    # Retrieve existing context or start new
-    history = conv_service.get_history(candidate_id)
-
-    conv_service.add_message(candidate_id, "user", user_text)
+    candidate_id = request.conversation_id or os.urandom(16).hex()
 
+    # Snapshot previous turns, then store the user turn while Gemini works.
+    # The history store (Redis) is optional: if it is down, answer without history.
     try:
-        history_text = conv_service.format_history_for_prompt(history)
+        history = await conv_service.get_history(candidate_id)
+    except Exception as e:
+        logger.warning("History unavailable, continuing without it: %s", str(e) or type(e).__name__)
+        history = []
+    user_write = _run_in_background(conv_service.add_message(candidate_id, "user", user_text))
 
-        context_str = ""
+    try:
+        page_text = ""
         if request.page_context:
-            context_str += (
+            page_text = (
                 f"\nPAGE CONTEXT:\nURL: {request.page_context.url}\n"
                 f"Title: {request.page_context.title}\n"
                 f"Size: {request.page_context.width}x{request.page_context.height}\n"
                 f"TabID: {request.page_context.tabId}\n"
             )
-        
-        if request.context:
-            context_str += f"\nDOM ELEMENTS/DATA:\n{json_lib.dumps(request.context, indent=2)}\n"
-
-        prompt = (
-            f'User request: "{user_text}"\n'
-            f'{history_text}\n'
-            f'{context_str}\n\n'
-            f'Analyze the request and context. Respond with JSON based on the System Protocol.'
+        dom_text = json.dumps(compact_dom(limit_elements(request.context, user_text))) if request.context else ""
+        request_text = f'User request: "{user_text}"\n'
+
+        # Trim history, then the DOM, so the prompt stays within the token budget
+        history_text, dom_text = conv_service.fit_prompt_budget(
+            history, dom_text, len(request_text) + len(page_text) + len(_PROMPT_INSTRUCTION)
         )
 
-        # Build full prompt with system instructions
-        full_prompt = SYSTEM_PROMPT + "\n\n" + prompt
-        
-        # Call Gemini service
-        response = await gemini_service.generate_content(full_prompt)
-        
-        response_text = response.text.strip()
-        logger.debug(f"Gemini Response: {response_text}")
-
-        # Parse JSON
-        try:
-            parsed = json_lib.loads(response_text)
-        except json_lib.JSONDecodeError:
-            cleaned = response_text.replace("```json", "").replace("```", "").strip()
-            parsed = json_lib.loads(cleaned)
+        # Assemble the prompt from parts and join once
+        parts = [request_text, history_text, "\n", page_text]
+        if dom_text:
+            parts.extend(("\nDOM ELEMENTS/DATA:\n", dom_text, "\n"))
+        parts.append(_PROMPT_INSTRUCTION)
+        prompt = "".join(parts)
+
+        # Call Gemini service (SYSTEM_PROMPT is applied by the model) unless this exact prompt was just answered
+        response_text = gemini_service.get_cached_response(prompt)
+        cache_hit = response_text is not None
+        if not cache_hit:
+            # The reply is usually spoken next: reconnect to TTS (if idle) in parallel with Gemini
+            _run_in_background(tts_service.warm_up())
+            response = await asyncio.wait_for(
+                gemini_service.generate_content(prompt), gemini_service.GENERATE_TIMEOUT
+            )
+            response_text = response.text.strip()
+            logger.debug("Gemini Response: %s", response_text)
+        else:
+            logger.debug("Gemini Response (cached): %s", response_text)
+
+        # Parse JSON (tolerates markdown code fences)
+        parsed = json.extract_object(response_text)
 
         # Note: 'response' field is legacy - frontend uses actions (say/ask) for speech
         assistant_response = parsed.get("response", "")
@@ -96,29 +173,30 @@ async def conversation(request: ConversationRequest):
         completed_flag = parsed.get("completed", False) # Default to False if missing (CONTINUE), but prompt demands it
         raw_post_analysis = parsed.get("post_analysis", [])
 
-        # Normalize actions to list of Action objects
-        valid_actions = []
-        if raw_actions:
-            for act in raw_actions:
-                if isinstance(act, dict) and "type" in act:
-                    valid_actions.append(Action(type=act["type"], args=act.get("args", {})))
-
-        # Normalize post_analysis to list of Action objects
-        valid_post_analysis = []
-        if raw_post_analysis:
-            for act in raw_post_analysis:
-                if isinstance(act, dict) and "type" in act:
-                    valid_post_analysis.append(Action(type=act["type"], args=act.get("args", {})))
+        # Normalize actions / post_analysis to lists of Action objects
+        valid_actions = _to_actions(raw_actions)
+        valid_post_analysis = _to_actions(raw_post_analysis)
 
         # Store the FULL AI response (actions) in history, not just the empty response field
         # This is critical for the AI to remember what it did in previous turns
-        history_content = json_lib.dumps({
+        history_content = json.dumps({
             "actions": [{"type": a.type, "args": a.args} for a in valid_actions] if valid_actions else [],
             "completed": completed_flag
         })
-        conv_service.add_message(candidate_id, "assistant", history_content)
-
-        return ConversationResponse(
+        # Cache on a miss only (hits must not extend the TTL), and only replies safe to replay
+        if not cache_hit and not any(a.type in _MUTATIVE_ACTIONS for a in valid_actions + valid_post_analysis):
+            gemini_service.cache_response(prompt, response_text)
+        # The client speaks say/ask actions next via /speak: have their audio ready by then
+        for action in valid_actions:
+            if action.type in ("say", "ask") and isinstance(action.args.get("text"), str):
+                tts_service.prefetch_speech(action.args["text"])
+        # Keep the user turn ahead of the assistant turn; a failed write is logged by
+        # _on_background_done and must not fail a turn Gemini already answered
+        await asyncio.wait([user_write])
+        _run_in_background(conv_service.add_message(candidate_id, "assistant", history_content))
+
+        # FastAPI validates against response_model on the way out; don't validate twice
+        return ConversationResponse.model_construct(
             response=assistant_response,
             actions=valid_actions,
             post_analysis=valid_post_analysis if valid_post_analysis else None,
@@ -127,11 +205,10 @@ async def conversation(request: ConversationRequest):
             conversation_id=candidate_id
         )
 
+    except (json.JSONDecodeError, google_exceptions.GoogleAPIError, asyncio.TimeoutError) as e:
+        # Expected upstream failures (malformed reply, Vertex errors, timeout): no traceback
+        logger.warning("Conversation failed: %s", str(e) or type(e).__name__)
+        return _error_response(e, candidate_id)
     except Exception as e:
-        logger.error(f"Conversation error: {e}", exc_info=True)
-        return ConversationResponse(
-            response=f"I had a problem processing that. Error: {str(e)}",
-            actions=None,
-            completed=True,
-            conversation_id=candidate_id if 'candidate_id' in locals() else None
-        )
+        logger.error("Conversation error: %s", e, exc_info=True)
+        return _error_response(e, candidate_id)
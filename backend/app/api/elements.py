@@ -1,33 +1,44 @@
 """
 Element resolution API endpoint.
 """
-from fastapi import APIRouter
-import json as json_lib
+import asyncio
 
+from fastapi import APIRouter, Depends
+from google.api_core import exceptions as google_exceptions
+
+from app.api.deps import json_body, json_body_openapi
+from app.core import json
 from app.core.logging import logger
 from app.models import ResolveElementRequest, ResolveElementResponse
 from app.services import gemini as gemini_service
+from app.services.dom import compact_dom, limit_elements
 
 router = APIRouter()
 
 
-@router.post("/resolve-element", response_model=ResolveElementResponse)
-async def resolve_element(request: ResolveElementRequest):
+@router.post(
+    "/resolve-element",
+    response_model=ResolveElementResponse,
+    openapi_extra=json_body_openapi(ResolveElementRequest),
+)
+async def resolve_element(request: ResolveElementRequest = Depends(json_body(ResolveElementRequest))):
     """
     Given DOM context, find the correct element ID for an action.
     """
-    model = gemini_service.get_model()
-    if not model:
-        return ResolveElementResponse(
+    if not gemini_service.IS_READY:
+        return ResolveElementResponse.model_construct(
             element_id=None,
             success=False,
             message="Gemini not configured"
         )
 
+    query = f"{request.action_description} {request.action_value or ''}"
+    dom_text = json.dumps(compact_dom(limit_elements(request.dom_context, query)))
+
     resolve_prompt = f"""You are a DOM element finder. Given a DOM snapshot, find the element that matches the description.
 
 DOM CONTEXT:
-{json_lib.dumps(request.dom_context, indent=2)}
+{dom_text}
 
 TASK: Find the element for: {request.action_description}
 Action type: {request.action_type}
@@ -48,22 +59,13 @@ Look for elements by:
 Return JSON ONLY."""
 
     try:
-        result = await gemini_service.generate_content_async(resolve_prompt)
+        result = await asyncio.wait_for(
+            gemini_service.generate_content_async(resolve_prompt), gemini_service.GENERATE_TIMEOUT
+        )
         response_text = result.text.strip()
         
-        # Clean up response
-        if "```" in response_text:
-            import re
-            match = re.search(r'```(?:json)?\s*\n?(.*?)\n?```', response_text, re.DOTALL)
-            if match:
-                response_text = match.group(1).strip()
-        
-        first_brace = response_text.find('{')
-        last_brace = response_text.rfind('}')
-        if first_brace != -1 and last_brace > first_brace:
-            response_text = response_text[first_brace:last_brace + 1]
-        
-        parsed = json_lib.loads(response_text)
+        # Parse JSON (tolerates markdown code fences)
+        parsed = json.extract_object(response_text)
         element_id = parsed.get("elementId")
         confidence = parsed.get("confidence", "low")
         
@@ -80,8 +82,15 @@ Return JSON ONLY."""
                 message=parsed.get("reason", "Element not found")
             )
             
+    except (json.JSONDecodeError, google_exceptions.GoogleAPIError, asyncio.TimeoutError) as e:
+        logger.warning("Element resolution failed: %s", str(e) or type(e).__name__)
+        return ResolveElementResponse(
+            element_id=None,
+            success=False,
+            message=str(e) or type(e).__name__
+        )
     except Exception as e:
-        logger.error(f"Element resolution failed: {e}")
+        logger.error("Element resolution failed: %s", e, exc_info=True)
         return ResolveElementResponse(
             element_id=None,
             success=False,
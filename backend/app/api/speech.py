@@ -2,7 +2,7 @@
 Text-to-Speech API endpoint.
 """
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
 
 from app.core.logging import logger
 from app.models import SpeakRequest
@@ -11,23 +11,41 @@ from app.services import elevenlabs as tts_service
 router = APIRouter()
 
 
-@router.post("/speak")
-async def speak(request: SpeakRequest):
-    """
-    Convert text to speech using ElevenLabs API.
-    Returns audio stream.
-    """
+_AUDIO_HEADERS = {"Content-Disposition": "inline; filename=speech.mp3"}
+# Live synthesis: tell proxies not to store (and so not buffer) the stream
+_STREAM_HEADERS = {**_AUDIO_HEADERS, "Cache-Control": "no-store"}
+
+
+async def _stream(text: str) -> FileResponse | StreamingResponse:
+    """Serve cached (or prefetched) audio, or start ElevenLabs synthesis and stream the audio back."""
+    await tts_service.wait_for_prefetch(text)
+    cached = tts_service.get_cached_speech(text)
+    if cached is not None:
+        return FileResponse(cached, media_type="audio/mpeg", headers=_AUDIO_HEADERS)
+
     try:
-        audio_data = await tts_service.generate_speech(request.text)
+        audio_stream = await tts_service.generate_speech(text)
         
         return StreamingResponse(
-            iter([audio_data]),
+            audio_stream,
             media_type="audio/mpeg",
-            headers={"Content-Disposition": "inline; filename=speech.mp3"}
+            headers=_STREAM_HEADERS
         )
         
-    except ImportError as e:
+    except RuntimeError as e:
+        # Expected TTS failures (missing key, quota, upstream HTTP errors): no traceback
+        logger.warning("Speak failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
-        logger.error(f"Speak failed: {e}")
+        logger.error("Speak failed: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/speak")
+async def speak(request: SpeakRequest):
+    """
+    Convert text to speech using ElevenLabs API.
+    Returns audio stream.
+    """
+    return await _stream(request.text)
+
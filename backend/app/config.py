@@ -3,42 +3,150 @@ Configuration module for Aeyes Backend
 Handles environment loading, credentials, and settings.
 """
 import os
-import json as json_lib
+import tempfile
+from functools import lru_cache
+from pathlib import Path
 from dotenv import load_dotenv
 
-# Load environment variables
-env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
-print(f"[Aeyes] Loading environment from: {env_path}")
-load_dotenv(env_path, override=True)
-
-# Google Cloud Credentials
-GOOGLE_CREDENTIALS_PATH = os.getenv(
-    "GOOGLE_APPLICATION_CREDENTIALS",
-    os.path.join(os.path.dirname(os.path.dirname(__file__)), "service-account-key.json")
-)
-LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
-
-# Auto-extract project ID from service account JSON or environment
-PROJECT_ID = os.getenv("GCP_PROJECT")
-if not PROJECT_ID:
-    try:
-        with open(GOOGLE_CREDENTIALS_PATH, 'r') as f:
-            sa_data = json_lib.load(f)
+from app.core import json
+from app.core.logging import logger
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# Set by _init(); declared here (unbound) so a reload doesn't reset them
+GOOGLE_CREDENTIALS_PATH: str
+LOCATION: str
+PROJECT_ID: str | None
+SERVICE_ACCOUNT_INFO: dict | None  # Parsed GOOGLE_APPLICATION_CREDENTIALS_JSON, if set
+
+
+@lru_cache(maxsize=1)
+def load_service_account(path: str) -> dict:
+    """Read and parse the service account JSON (once per path)."""
+    return json.loads(Path(path).read_bytes())
+
+
+def _init():
+    """Load .env and resolve Google Cloud credentials and project ID."""
+    global GOOGLE_CREDENTIALS_PATH, LOCATION, PROJECT_ID, SERVICE_ACCOUNT_INFO
+
+    # Load environment variables
+    env_path = os.path.join(BACKEND_DIR, '.env')
+    logger.info("Loading environment from: %s", env_path)
+    load_dotenv(env_path, override=True)
+
+    # Google Cloud Credentials
+    GOOGLE_CREDENTIALS_PATH = os.getenv(
+        "GOOGLE_APPLICATION_CREDENTIALS",
+        os.path.join(BACKEND_DIR, "service-account-key.json")
+    )
+    LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
+
+    # Inline service account JSON (e.g. from a secret) takes precedence over the key file
+    SERVICE_ACCOUNT_INFO = None
+    inline_credentials = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
+    if inline_credentials:
+        try:
+            SERVICE_ACCOUNT_INFO = json.loads(inline_credentials)
+            logger.info("Using inline service account credentials")
+        except json.JSONDecodeError as e:
+            logger.warning("Invalid GOOGLE_APPLICATION_CREDENTIALS_JSON: %s", e)
+
+    # Auto-extract project ID from service account JSON or environment
+    PROJECT_ID = os.getenv("GCP_PROJECT")
+    if not PROJECT_ID and SERVICE_ACCOUNT_INFO:
+        PROJECT_ID = SERVICE_ACCOUNT_INFO.get('project_id')
+        logger.info("Loaded project ID from inline service account: %s", PROJECT_ID)
+    elif not PROJECT_ID:
+        try:
+            sa_data = load_service_account(GOOGLE_CREDENTIALS_PATH)
             PROJECT_ID = sa_data.get('project_id')
-            print(f"[Aeyes] Loaded project ID from service account: {PROJECT_ID}")
-    except Exception as e:
-        print(f"[Aeyes] Warning: Could not read project ID from service account: {e}")
-else:
-    print(f"[Aeyes] Using project ID from environment: {PROJECT_ID}")
+            logger.info("Loaded project ID from service account: %s", PROJECT_ID)
+        except Exception as e:
+            logger.warning("Could not read project ID from service account: %s", e)
+    else:
+        logger.info("Using project ID from environment: %s", PROJECT_ID)
+
+    # Inline credentials are passed to vertexai.init directly
+    if SERVICE_ACCOUNT_INFO:
+        return
+
+    # Set credentials environment variable for Google libraries only if file exists
+    if os.path.exists(GOOGLE_CREDENTIALS_PATH):
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_CREDENTIALS_PATH
+        logger.info("Using credentials file: %s", GOOGLE_CREDENTIALS_PATH)
+    else:
+        logger.info("No credentials file found - using environment default (Cloud Run service account)")
 
-# Set credentials environment variable for Google libraries only if file exists
-if os.path.exists(GOOGLE_CREDENTIALS_PATH):
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_CREDENTIALS_PATH
-    print(f"[Aeyes] Using credentials file: {GOOGLE_CREDENTIALS_PATH}")
-else:
-    print("[Aeyes] No credentials file found - using environment default (Cloud Run service account)")
 
+# Run once per process; importlib.reload keeps module globals, so the sentinel survives it
+if not globals().get("_INITIALIZED"):
+    _init()
+    _INITIALIZED = True
 
+
+# Environment is loaded once by _init(), so these lookups are cached for the process
+@lru_cache(maxsize=1)
 def get_elevenlabs_api_key() -> str | None:
     """Get ElevenLabs API key from environment."""
     return os.getenv("ELEVENLABS_API_KEY")
+
+
+def is_production() -> bool:
+    """True when running on Cloud Run (K_SERVICE is set by the platform)."""
+    return bool(os.getenv("K_SERVICE"))
+
+
+@lru_cache(maxsize=1)
+def get_elevenlabs_output_format() -> str:
+    """
+    Get the ElevenLabs audio format.
+    Defaults to 22.05 kHz / 32 kbps MP3: plenty for speech, about a quarter of the bytes of 44.1 kHz / 128 kbps.
+    """
+    return os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_22050_32")
+
+
+def get_redis_url() -> str | None:
+    """Get the Redis URL for shared conversation history (unset: in-memory history)."""
+    return os.getenv("REDIS_URL")
+
+
+def get_tts_cache_dir() -> Path:
+    """Get the directory for cached TTS audio (TTS_CACHE_DIR, default: system temp dir)."""
+    return Path(os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "aeyes_tts")))
+
+
+def is_tts_prefetch_enabled() -> bool:
+    """True unless TTS_PREFETCH=0: synthesize reply speech while the reply is sent to the client."""
+    return os.getenv("TTS_PREFETCH", "1") != "0"
+
+
+def get_rate_limit_rpm(service: str, default: int) -> int:
+    """Get a client-side requests-per-minute limit from <SERVICE>_RPM (e.g. GEMINI_RPM)."""
+    return int(os.getenv(f"{service}_RPM", default))
+
+
+def is_debug() -> bool:
+    """True when AEYES_DEBUG=1: log raw model responses and other debug output."""
+    return os.getenv("AEYES_DEBUG") == "1"
+
+
+def get_profile_format() -> str | None:
+    """Get the request profile format from PROFILE ("html" or "speedscope"; unset: profiling off)."""
+    profile = os.getenv("PROFILE", "").lower()
+    if profile in ("1", "true", "html"):
+        return "html"
+    if profile == "speedscope":
+        return "speedscope"
+    return None
+
+
+def get_cors_origins() -> list[str]:
+    """
+    Get allowed CORS origins.
+    Pins the Chrome extension origin when EXTENSION_ID is set; otherwise allows any origin (dev).
+    """
+    extension_id = os.getenv("EXTENSION_ID")
+    if extension_id:
+        return [f"chrome-extension://{extension_id}"]
+    return ["*"]
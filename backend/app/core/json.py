@@ -0,0 +1,49 @@
+"""
+JSON helpers for Aeyes Backend.
+Uses orjson when it is installed and falls back to the standard library.
+"""
+import json as json_lib
+import re
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so this catches both
+JSONDecodeError = json_lib.JSONDecodeError
+
+# Outermost {...} span; code fences and prose around it are skipped
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def dumps(obj) -> str:
+    """Serialize obj to a compact JSON string."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json_lib.dumps(obj, separators=(",", ":"))
+
+
+def loads(data: str | bytes):
+    """Parse a JSON string or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json_lib.loads(data)
+
+
+def extract_object(text: str) -> dict:
+    """
+    Parse the JSON object embedded in an LLM reply.
+    Tolerates markdown code fences and prose around the object.
+    """
+    # JSON-mode replies are a bare object: parse directly, skipping the regex scan
+    if text.startswith("{"):
+        try:
+            return loads(text)
+        except JSONDecodeError:
+            pass
+
+    match = _JSON_OBJECT.search(text)
+    if match is None:
+        raise JSONDecodeError("No JSON object found in response", text, 0)
+    return loads(match.group(0))
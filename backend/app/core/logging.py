@@ -7,14 +7,17 @@ import sys
 def setup_logging():
     """
     Set up basic logging configuration.
+    Skipped if the root logger already has handlers, so re-imports
+    don't register a second StreamHandler and duplicate every line.
     """
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    if not logging.getLogger().handlers:
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+            handlers=[
+                logging.StreamHandler(sys.stdout)
+            ]
+        )
     
     # Set levels for noisy libraries
     logging.getLogger("uvicorn.error").setLevel(logging.INFO)
@@ -0,0 +1,178 @@
+"""
+ASGI middleware for Aeyes Backend.
+"""
+import re
+import time
+import zlib
+from pathlib import Path
+
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logging import logger
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+    PROFILING_AVAILABLE = True
+except ImportError:  # Dev-only dependency
+    PROFILING_AVAILABLE = False
+
+# Upper bound on a request body as sent (compressed or not)
+MAX_REQUEST_BODY = 4 * 1024 * 1024
+# Upper bound on a decompressed request body (guards against gzip bombs)
+MAX_DECOMPRESSED_BODY = 16 * 1024 * 1024
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Reject bodies larger than MAX_REQUEST_BODY with 413.
+    A declared Content-Length is checked before anything is read; chunked bodies are counted as they arrive.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = _header(scope, b"content-length")
+        if content_length is not None:
+            try:
+                too_large = int(content_length) > MAX_REQUEST_BODY
+            except ValueError:
+                await PlainTextResponse("Invalid Content-Length", status_code=400)(scope, receive, send)
+                return
+            if too_large:
+                await PlainTextResponse("Request body too large", status_code=413)(scope, receive, send)
+                return
+
+        size = 0
+        response_started = False
+
+        async def receive_limited() -> Message:
+            nonlocal size
+            message = await receive()
+            if message["type"] == "http.request":
+                size += len(message.get("body", b""))
+                if size > MAX_REQUEST_BODY:
+                    raise _BodyTooLarge
+            return message
+
+        async def send_tracked(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_limited, send_tracked)
+        except _BodyTooLarge:
+            if response_started:
+                raise
+            await PlainTextResponse("Request body too large", status_code=413)(scope, receive, send)
+
+
+class _BodyTooLarge(Exception):
+    """Raised from receive once a streamed body passes MAX_REQUEST_BODY."""
+
+
+class GzipRequestMiddleware:
+    """
+    Decompress request bodies sent with Content-Encoding: gzip.
+    The extension gzips large DOM snapshots; routes see the plain JSON body.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        encoding = _header(scope, b"content-encoding") if scope["type"] == "http" else None
+        if encoding is None or encoding.strip().lower() != b"gzip":
+            await self.app(scope, receive, send)
+            return
+
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        parts = []
+        size = 0
+        more_body = True
+        try:
+            while more_body:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                more_body = message.get("more_body", False)
+                chunk = decompressor.decompress(message.get("body", b""), MAX_DECOMPRESSED_BODY - size + 1)
+                size += len(chunk)
+                if size > MAX_DECOMPRESSED_BODY:
+                    await PlainTextResponse("Request body too large", status_code=413)(scope, receive, send)
+                    return
+                parts.append(chunk)
+            parts.append(decompressor.flush())
+        except zlib.error:
+            await PlainTextResponse("Invalid gzip body", status_code=400)(scope, receive, send)
+            return
+
+        body = b"".join(parts)
+        headers = [
+            (name, value) for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ]
+        headers.append((b"content-length", str(len(body)).encode()))
+        scope = {**scope, "headers": headers}
+
+        body_sent = False
+
+        async def receive_body() -> Message:
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, receive_body, send)
+
+
+class ProfileMiddleware:
+    """
+    Profile each HTTP request with pyinstrument (dev only, enabled by PROFILE).
+    Writes one report per request to profiles/: HTML flamegraphs, or speedscope JSON for diffing runs.
+    """
+
+    def __init__(self, app: ASGIApp, output_format: str = "html", output_dir: str = "profiles"):
+        self.app = app
+        self.output_format = output_format
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            self._write(scope["path"], profiler)
+
+    def _write(self, path: str, profiler):
+        name = re.sub(r"[^\w-]+", "_", path).strip("_") or "root"
+        if self.output_format == "speedscope":
+            renderer, suffix = SpeedscopeRenderer(), "speedscope.json"
+        else:
+            renderer, suffix = HTMLRenderer(), "html"
+        output = self.output_dir / f"profile-{name}-{time.time_ns()}.{suffix}"
+        output.write_text(profiler.output(renderer=renderer))
+        logger.info("Wrote request profile: %s", output)
+
+
+def _header(scope: Scope, name: bytes) -> bytes | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
@@ -0,0 +1,37 @@
+"""
+Client-side rate limiting for Aeyes Backend.
+Throttles calls before they reach an upstream API instead of reacting to its 429s.
+"""
+import asyncio
+import time
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket admission gate: bursts up to capacity, then refill_per_sec calls per second.
+    Waiters are served in arrival order.
+    """
+
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_sec)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.refill_per_sec)
+
+
+def per_minute(rpm: int) -> AsyncTokenBucket:
+    """Bucket allowing rpm calls per minute, with bursts of up to rpm."""
+    return AsyncTokenBucket(capacity=rpm, refill_per_sec=rpm / 60)
@@ -1,6 +1,8 @@
 """
 Aeyes Backend - FastAPI application factory.
 """
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -10,8 +12,41 @@ from app.api.conversation import router as conversation_router
 from app.api.speech import router as speech_router
 from app.api.elements import router as elements_router
 
+from app.api.deps import install_openapi_schemas
+from app.config import (
+    get_cors_origins, get_elevenlabs_api_key, get_profile_format, get_redis_url, is_debug, is_production,
+)
+from app.core.logging import logger
+from app.core.middleware import (
+    PROFILING_AVAILABLE, GzipRequestMiddleware, ProfileMiddleware, RequestSizeLimitMiddleware,
+)
+
 # Import services
+from app.services import conversation as conv_service
 from app.services import gemini as gemini_service
+from app.services import elevenlabs as tts_service
+
+
+def _check_configuration():
+    """
+    Log which services are configured; in production, refuse to start without them
+    so a misconfigured deploy fails its rollout instead of answering with errors.
+    """
+    missing = []
+    if not gemini_service.IS_READY:
+        missing.append("Gemini (GCP_PROJECT / service account)")
+    if not get_elevenlabs_api_key():
+        missing.append("ELEVENLABS_API_KEY")
+
+    if not missing:
+        logger.info("Gemini and ElevenLabs configured")
+    elif is_production():
+        raise RuntimeError(f"Missing configuration: {', '.join(missing)}")
+    else:
+        logger.warning("Missing configuration: %s", ", ".join(missing))
+
+    if is_production() and get_cors_origins() == ["*"]:
+        logger.warning("EXTENSION_ID not set: CORS allows requests from any origin")
 
 
 @asynccontextmanager
@@ -19,12 +54,18 @@ async def lifespan(app: FastAPI):
     """
     Handle app startup and shutdown events.
     """
-    print("[Aeyes] Starting up (lifespan)...")
+    logger.info("Starting up (lifespan)...")
     gemini_service.init_gemini()
+    conv_service.init_history_store(get_redis_url())
+    _check_configuration()
+    await gemini_service.warm_up()
+    await tts_service.warm_up()
     
     yield
     
-    print("[Aeyes] Shutting down (lifespan)...")
+    logger.info("Shutting down (lifespan)...")
+    await tts_service.close_elevenlabs()
+    await conv_service.close_history_store()
 
 
 def create_app() -> FastAPI:
@@ -38,17 +79,38 @@ def create_app() -> FastAPI:
         lifespan=lifespan,
     )
 
+    # Debug logs (e.g. raw Gemini responses) are formatted only when enabled
+    if is_debug():
+        logger.setLevel(logging.DEBUG)
+
+    # Dev only: per-request pyinstrument reports (innermost, so it times the handlers)
+    profile_format = get_profile_format()
+    if profile_format and not PROFILING_AVAILABLE:
+        logger.warning("PROFILE is set but pyinstrument is not installed (pip install pyinstrument)")
+    elif profile_format:
+        app.add_middleware(ProfileMiddleware, output_format=profile_format)
+        logger.info("Request profiling enabled (%s)", profile_format)
+
+    # Large DOM uploads arrive gzipped; inflate them before routing
+    app.add_middleware(GzipRequestMiddleware)
+    # Runs first: oversized bodies are refused before they are read
+    app.add_middleware(RequestSizeLimitMiddleware)
+
+    # Concrete lists let Starlette send static headers instead of echoing the request;
+    # max_age lets the browser cache preflights for a day
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=["*"],  # Allows all origins, crucial for Chrome Extension connectivity
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
+        allow_origins=get_cors_origins(),
+        allow_credentials=False,  # The extension doesn't send cookies
+        allow_methods=["GET", "POST"],
+        allow_headers=["content-type", "content-encoding"],
+        max_age=86400,
     )
 
     app.include_router(conversation_router, tags=["Conversation"])
     app.include_router(speech_router, tags=["Speech"])
     app.include_router(elements_router, tags=["Elements"])
+    install_openapi_schemas(app)
 
     return app
 
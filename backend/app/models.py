@@ -1,7 +1,9 @@
 """
 Pydantic models for Aeyes Backend API
 """
-from pydantic import BaseModel
+from dataclasses import dataclass, field
+
+from pydantic import BaseModel, Field
 
 
 class PageContext(BaseModel):
@@ -13,15 +15,16 @@ class PageContext(BaseModel):
     tabId: int | None = None
 
 
-class Action(BaseModel):
-    """Single action to be executed by the frontend."""
+@dataclass(slots=True)
+class Action:
+    """Single action to be executed by the frontend (slots dataclass: built several times per reply)."""
     type: str
-    args: dict = {}
+    args: dict = field(default_factory=dict)
 
 
 class ConversationRequest(BaseModel):
     """Request body for /conversation endpoint."""
-    transcript: str
+    transcript: str = Field(max_length=2000)
     context: dict | None = None  # DOM snapshot (legacy/full)
     page_context: PageContext | None = None  # Lightweight context
     conversation_id: str | None = None
@@ -1,45 +1,133 @@
 """
 Conversation history management for Aeyes Backend.
+History lives in process memory, or in Redis when REDIS_URL is set (shared across workers).
 """
-import time
+from collections import OrderedDict, deque
 
-# In-memory conversation history
-# Structure: { conversation_id: [ {role, content, timestamp}, ... ] }
-_conversation_history = {}
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - only needed when REDIS_URL is set
+    redis_asyncio = None
 
+from app.core import json
+from app.core.logging import logger
+from app.core.prompts import SYSTEM_PROMPT_TOKENS
 
-def get_history(conversation_id: str) -> list:
-    """Get conversation history for a given ID."""
-    return _conversation_history.get(conversation_id, [])
+# Bounds on the in-memory store: least recently used conversations are evicted,
+# and each keeps only its latest messages (must cover format_history_for_prompt's limit)
+MAX_CONVERSATIONS = 1024
+MAX_MESSAGES_PER_CONVERSATION = 32
 
+# Prompt size cap per turn (system prompt included), estimated at ~4 characters per token;
+# keeps prefill cost bounded when a page sends a huge DOM
+MAX_PROMPT_TOKENS = 32_000
+CHARS_PER_TOKEN = 4
+PROMPT_CHAR_BUDGET = (MAX_PROMPT_TOKENS - SYSTEM_PROMPT_TOKENS) * CHARS_PER_TOKEN
+HISTORY_PROMPT_LIMIT = 6
+TRUNCATION_MARKER = "...(truncated)"
 
-def add_message(conversation_id: str, role: str, content: str):
+# In-memory conversation history, least recently used first
+# Structure: { conversation_id: deque([ {role, content}, ... ]) }
+_conversation_history: OrderedDict[str, deque] = OrderedDict()
+
+# Redis store (set by init_history_store): one list of JSON messages per conversation,
+# trimmed like the in-memory deques and expiring after HISTORY_TTL idle seconds
+HISTORY_TTL = 3600
+_REDIS_KEY = "aeyes:conversation:{}"
+_redis = None
+
+
+def init_history_store(redis_url: str | None):
+    """Switch history to Redis when a URL is configured; otherwise keep it in memory."""
+    global _redis
+    if not redis_url:
+        return
+    if redis_asyncio is None:
+        logger.warning("REDIS_URL is set but the redis package is not installed - keeping history in memory")
+        return
+    _redis = redis_asyncio.from_url(redis_url)
+    logger.info("Conversation history stored in Redis")
+
+
+async def close_history_store():
+    """Close the Redis connection pool (called on shutdown)."""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+async def get_history(conversation_id: str) -> list:
+    """Get a snapshot of the conversation history for a given ID."""
+    if _redis is not None:
+        raw = await _redis.lrange(_REDIS_KEY.format(conversation_id), 0, -1)
+        return [json.loads(item) for item in raw]
+
+    messages = _conversation_history.get(conversation_id)
+    if messages is None:
+        return []
+    _conversation_history.move_to_end(conversation_id)
+    return list(messages)
+
+
+async def add_message(conversation_id: str, role: str, content: str):
     """Add a message to the conversation history."""
-    if conversation_id not in _conversation_history:
-        _conversation_history[conversation_id] = []
+    if _redis is not None:
+        key = _REDIS_KEY.format(conversation_id)
+        async with _redis.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, json.dumps({"role": role, "content": content}))
+            pipe.ltrim(key, -MAX_MESSAGES_PER_CONVERSATION, -1)
+            pipe.expire(key, HISTORY_TTL)
+            await pipe.execute()
+        return
+
+    messages = _conversation_history.get(conversation_id)
+    if messages is None:
+        messages = _conversation_history[conversation_id] = deque(maxlen=MAX_MESSAGES_PER_CONVERSATION)
+        if len(_conversation_history) > MAX_CONVERSATIONS:
+            _conversation_history.popitem(last=False)
+    else:
+        _conversation_history.move_to_end(conversation_id)
     
-    _conversation_history[conversation_id].append({
-        "role": role,
-        "content": content,
-        "timestamp": time.time()
-    })
+    messages.append({"role": role, "content": content})
+
+
+# Speaker labels used in the prompt; any other role is the assistant
+_ROLE_LABELS = {"user": "User"}
 
 
-def format_history_for_prompt(history: list, limit: int = 6) -> str:
+def format_history_for_prompt(history: list, limit: int = HISTORY_PROMPT_LIMIT) -> str:
     """Format recent history as text for LLM prompt."""
     if not history:
         return ""
     
-    recent_history = history[-limit:]
-    history_text = "\n\nRecent conversation:\n"
-    for msg in recent_history:
-        role = "User" if msg["role"] == "user" else "Aeyes"
-        history_text += f"{role}: {msg['content']}\n"
-    
-    return history_text
+    lines = "".join(
+        f"{_ROLE_LABELS.get(msg['role'], 'Aeyes')}: {msg['content']}\n"
+        for msg in history[-limit:]
+    )
+    return "\n\nRecent conversation:\n" + lines
+
+
+def fit_prompt_budget(history: list, dom_text: str, reserved_chars: int) -> tuple[str, str]:
+    """
+    Format history and DOM text so the prompt fits PROMPT_CHAR_BUDGET.
+    Drops the oldest turns first, then truncates the DOM; reserved_chars is the rest of the prompt.
+    """
+    budget = PROMPT_CHAR_BUDGET - reserved_chars
+    recent = history[-HISTORY_PROMPT_LIMIT:]
+    history_text = format_history_for_prompt(recent)
+    while recent and len(history_text) + len(dom_text) > budget:
+        recent = recent[1:]
+        history_text = format_history_for_prompt(recent)
+
+    if len(history_text) + len(dom_text) > budget:
+        dom_text = dom_text[:max(budget - len(history_text), 0)] + TRUNCATION_MARKER
+    return history_text, dom_text
 
 
-def clear_history(conversation_id: str):
+async def clear_history(conversation_id: str):
     """Clear history for a given ID."""
-    if conversation_id in _conversation_history:
-        del _conversation_history[conversation_id]
+    if _redis is not None:
+        await _redis.delete(_REDIS_KEY.format(conversation_id))
+        return
+    _conversation_history.pop(conversation_id, None)
@@ -0,0 +1,61 @@
+"""
+DOM snapshot preprocessing for Aeyes Backend.
+Shrinks snapshots before they are embedded in Gemini prompts (fewer prefill tokens).
+"""
+
+# Values that carry no information for the model
+_EMPTY = (None, "", [], {})
+
+# Most elements sent per prompt; beyond this, those matching the request are kept
+MAX_ELEMENTS = 200
+# Element fields compared against the request words when ranking
+_MATCH_FIELDS = ("text", "label", "placeholder", "alt", "value", "role")
+
+
+def compact_dom(node):
+    """
+    Return a copy of a DOM snapshot without null or empty values.
+    Element IDs, text and booleans (e.g. checked=false) are kept as-is.
+    """
+    if isinstance(node, dict):
+        compacted = {}
+        for key, value in node.items():
+            value = compact_dom(value)
+            if value not in _EMPTY:
+                compacted[key] = value
+        return compacted
+    if isinstance(node, list):
+        return [
+            item for item in map(compact_dom, node)
+            if item not in _EMPTY
+        ]
+    if isinstance(node, str):
+        return node.strip()
+    return node
+
+
+def limit_elements(snapshot: dict, query: str, limit: int = MAX_ELEMENTS) -> dict:
+    """
+    Cap snapshot["elements"] at limit entries.
+    Elements sharing the most words with query are kept, in their original page order.
+    """
+    elements = snapshot.get("elements")
+    if not isinstance(elements, list) or len(elements) <= limit:
+        return snapshot
+
+    words = set(query.lower().split())
+
+    def score(index: int) -> int:
+        element = elements[index]
+        if not isinstance(element, dict):
+            return 0
+        element_words = set()
+        for name in _MATCH_FIELDS:
+            value = element.get(name)
+            if isinstance(value, str):
+                element_words.update(value.lower().split())
+        return len(words & element_words)
+
+    # Stable sort: ties keep page order, so the top of the page wins
+    keep = sorted(sorted(range(len(elements)), key=score, reverse=True)[:limit])
+    return {**snapshot, "elements": [elements[i] for i in keep]}
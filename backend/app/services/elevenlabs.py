@@ -1,37 +1,190 @@
 """
 ElevenLabs Text-to-Speech service for Aeyes Backend.
 """
-from app.config import get_elevenlabs_api_key
+import asyncio
+import hashlib
+import os
+import time
+from collections.abc import AsyncIterator
+from pathlib import Path
 
+import httpx
 
-async def generate_speech(text: str, voice_id: str = "21m00Tcm4TlvDq8ikWAM", model_id: str = "eleven_turbo_v2_5"):
+from app.config import (
+    get_elevenlabs_api_key, get_elevenlabs_output_format, get_rate_limit_rpm, get_tts_cache_dir, is_tts_prefetch_enabled,
+)
+from app.core.logging import logger
+from app.core.ratelimit import per_minute
+
+DEFAULT_VOICE_ID = "21m00Tcm4TlvDq8ikWAM"
+DEFAULT_MODEL_ID = "eleven_turbo_v2_5"
+ELEVENLABS_API_URL = "https://api.elevenlabs.io"
+ELEVENLABS_STREAM_URL = ELEVENLABS_API_URL + "/v1/text-to-speech/{voice_id}/stream"
+# aiter_bytes buffers up to this much before yielding; ~1s of audio at 32 kbps
+CHUNK_SIZE = 4 * 1024
+
+# Synthesized audio is cached on disk by content hash; assistant phrases repeat a lot.
+# Least recently used files are removed beyond TTS_CACHE_MAX_FILES.
+TTS_CACHE_DIR = get_tts_cache_dir()
+TTS_CACHE_MAX_FILES = 500
+
+# Throttle before calling ElevenLabs rather than burning quota on rejected requests
+_rate_limiter = per_minute(get_rate_limit_rpm("ELEVENLABS", 120))
+
+# Background syntheses started by prefetch_speech, by cache path (also keeps the tasks referenced)
+_prefetches: dict[Path, asyncio.Task] = {}
+
+# Shared client so requests reuse pooled keep-alive connections (no TLS handshake per call)
+_client: httpx.AsyncClient | None = None
+# Idle pooled connections are kept this long; warm_up only reconnects once they may be gone
+KEEPALIVE_EXPIRY = 30.0  # seconds
+WARM_UP_TIMEOUT = 5.0  # seconds
+_last_request = 0.0  # time.monotonic() of the last call to ElevenLabs
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=60, limits=httpx.Limits(keepalive_expiry=KEEPALIVE_EXPIRY))
+    return _client
+
+
+async def close_elevenlabs():
+    """Close the shared HTTP client (called on shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def warm_up():
+    """
+    Open a pooled connection to ElevenLabs so the next synthesis skips the TCP/TLS handshake.
+    No-op while a connection used within KEEPALIVE_EXPIRY is still pooled.
+    """
+    global _last_request
+    if not get_elevenlabs_api_key() or time.monotonic() - _last_request < KEEPALIVE_EXPIRY:
+        return
+    _last_request = time.monotonic()
+    try:
+        await _get_client().head(ELEVENLABS_API_URL, timeout=WARM_UP_TIMEOUT)
+    except Exception as e:
+        logger.debug("ElevenLabs warm-up failed: %s", e)
+
+
+def _cache_path(text: str, voice_id: str, model_id: str, output_format: str) -> Path:
+    key = hashlib.blake2b(f"{voice_id}|{model_id}|{output_format}|{text}".encode(), digest_size=16).hexdigest()
+    return TTS_CACHE_DIR / f"{key}.mp3"
+
+
+def get_cached_speech(text: str, voice_id: str = DEFAULT_VOICE_ID, model_id: str = DEFAULT_MODEL_ID, output_format: str | None = None) -> Path | None:
+    """Get the cached audio file for this text, if it was synthesized before."""
+    path = _cache_path(text, voice_id, model_id, output_format or get_elevenlabs_output_format())
+    try:
+        os.utime(path)  # Mark as recently used for eviction
+    except OSError:
+        return None
+    return path
+
+
+def prefetch_speech(text: str, voice_id: str = DEFAULT_VOICE_ID, model_id: str = DEFAULT_MODEL_ID, output_format: str | None = None):
+    """
+    Start synthesizing text into the cache in the background, ahead of the client's /speak call.
+    No-op if the audio is already cached or being synthesized.
+    """
+    if not is_tts_prefetch_enabled() or not get_elevenlabs_api_key():
+        return
+    output_format = output_format or get_elevenlabs_output_format()
+    path = _cache_path(text, voice_id, model_id, output_format)
+    if path in _prefetches or path.exists():
+        return
+    task = asyncio.create_task(_prefetch(text, voice_id, model_id, output_format))
+    _prefetches[path] = task
+    task.add_done_callback(lambda _: _prefetches.pop(path, None))
+
+
+async def _prefetch(text: str, voice_id: str, model_id: str, output_format: str):
+    try:
+        async for _ in await generate_speech(text, voice_id, model_id, output_format):
+            pass
+    except Exception as e:
+        logger.warning("Speech prefetch failed: %s", e)
+
+
+async def wait_for_prefetch(text: str, voice_id: str = DEFAULT_VOICE_ID, model_id: str = DEFAULT_MODEL_ID, output_format: str | None = None):
+    """Wait for a running prefetch of this text to finish (its audio is then cached, unless it failed)."""
+    task = _prefetches.get(_cache_path(text, voice_id, model_id, output_format or get_elevenlabs_output_format()))
+    if task is not None:
+        # Shielded: a client disconnect must not cancel the synthesis for everyone else
+        await asyncio.shield(task)
+
+
+async def generate_speech(text: str, voice_id: str = DEFAULT_VOICE_ID, model_id: str = DEFAULT_MODEL_ID, output_format: str | None = None) -> AsyncIterator[bytes]:
     """
     Convert text to speech using ElevenLabs API.
-    Returns audio data as bytes.
+    Returns an async iterator of MP3 chunks, streamed as ElevenLabs produces them
+    and written to the cache once complete.
+    Errors (missing key, quota) are raised here, before any audio is sent.
     """
+    output_format = output_format or get_elevenlabs_output_format()
     api_key = get_elevenlabs_api_key()
     if not api_key:
         raise RuntimeError("ELEVENLABS_API_KEY not configured")
 
+    global _last_request
+    await _rate_limiter.acquire()
+    _last_request = time.monotonic()
+    client = _get_client()
     try:
-        from elevenlabs import ElevenLabs
-        client = ElevenLabs(api_key=api_key)
-        
-        # Generate audio
-        audio_generator = client.text_to_speech.convert(
-            voice_id=voice_id,
-            text=text,
-            model_id=model_id,
-            output_format="mp3_44100_128",
+        request = client.build_request(
+            "POST",
+            ELEVENLABS_STREAM_URL.format(voice_id=voice_id),
+            params={"output_format": output_format},
+            headers={"xi-api-key": api_key, "accept": "audio/mpeg"},
+            json={"text": text, "model_id": model_id},
         )
-        
-        # Collect audio chunks
-        return b"".join(audio_generator)
-        
-    except ImportError:
-        raise ImportError("ElevenLabs package not installed. Run: pip install elevenlabs")
+        response = await client.send(request, stream=True)
     except Exception as e:
-        error_msg = str(e)
+        raise RuntimeError(str(e))
+
+    if response.is_error:
+        error_msg = (await response.aread()).decode(errors="replace")
+        await response.aclose()
         if "quota_exceeded" in error_msg.lower():
             error_msg = "ElevenLabs API quota exceeded. Please check your account credits."
         raise RuntimeError(error_msg)
+
+    return _iter_audio(response, _cache_path(text, voice_id, model_id, output_format))
+
+
+async def _iter_audio(response: httpx.Response, cache_path: Path) -> AsyncIterator[bytes]:
+    """
+    Yield audio chunks and return the connection to the pool when done.
+    Only a fully received stream is cached (a client disconnect stops the generator first).
+    """
+    chunks = []
+    try:
+        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+            chunks.append(chunk)
+            yield chunk
+    finally:
+        await response.aclose()
+    try:
+        await asyncio.to_thread(_store_audio, cache_path, b"".join(chunks))
+    except OSError as e:
+        logger.warning("Failed to cache speech audio: %s", e)
+
+
+def _store_audio(path: Path, audio: bytes):
+    """Atomically write audio to the cache, then evict the least recently used files."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.stem}.{os.urandom(4).hex()}.tmp")
+    tmp_path.write_bytes(audio)
+    os.replace(tmp_path, path)
+
+    files = list(path.parent.glob("*.mp3"))
+    if len(files) > TTS_CACHE_MAX_FILES:
+        files.sort(key=lambda f: f.stat().st_mtime)
+        for old in files[:len(files) - TTS_CACHE_MAX_FILES]:
+            old.unlink(missing_ok=True)
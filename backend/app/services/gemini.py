@@ -1,80 +1,198 @@
 """
 Gemini integration service using Vertex AI for Aeyes Backend.
 """
+import asyncio
+import hashlib
+import random
+import time
+from collections import OrderedDict
+
 import vertexai
+from google.api_core import exceptions as google_exceptions
+from google.oauth2 import service_account
 from vertexai.generative_models import GenerativeModel, GenerationConfig, SafetySetting, HarmCategory
-from app.config import PROJECT_ID, LOCATION
+from app.config import PROJECT_ID, LOCATION, SERVICE_ACCOUNT_INFO, get_rate_limit_rpm
 from app.core.logging import logger
+from app.core.ratelimit import per_minute
+from app.core.prompts import SYSTEM_PROMPT
+
+# Global model instances
+_gemini_model = None  # Plain model (element resolution)
+_agent_model = None  # Model bound to SYSTEM_PROMPT (conversation)
+
+# Set once by init_gemini; endpoints gate on this instead of probing the model
+IS_READY: bool = False
+
+# Upper bound for one generation, retries included; endpoints reply with an apology past it
+GENERATE_TIMEOUT = 15.0  # seconds
+
+# Retries for rate limits / transient unavailability: exponential backoff with jitter
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 1.0  # seconds
+RETRY_MAX_DELAY = 30.0
+_RETRYABLE_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable)
+
+# Every call (retries included) takes a token, so bursts queue here instead of hitting 429s
+_rate_limiter = per_minute(get_rate_limit_rpm("GEMINI", 300))
+
+# Replies to identical prompts (same transcript, history and page) are reused briefly,
+# so a repeated question skips the Gemini round-trip
+RESPONSE_CACHE_TTL = 60  # seconds
+RESPONSE_CACHE_SIZE = 512
+_response_cache: OrderedDict[bytes, tuple[float, str]] = OrderedDict()
 
-# Global model instance
-_gemini_model = None
+# Default generation settings, built once and shared by every request
+DEFAULT_GENERATION_CONFIG = GenerationConfig(
+    temperature=0.3,
+    max_output_tokens=1024,
+    response_mime_type="application/json"
+)
+DEFAULT_SAFETY_SETTINGS = [
+    SafetySetting(
+        category=HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+        threshold=SafetySetting.HarmBlockThreshold.BLOCK_ONLY_HIGH,
+    ),
+    # ... other safety settings can be added here or passed in
+]
+
+# Element resolution returns a fixed shape, so decoding is constrained to it
+ELEMENT_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "elementId": {"type": "string", "nullable": True},
+        "confidence": {"type": "string", "enum": ["high", "medium", "low", "none"]},
+        "reason": {"type": "string"},
+    },
+    "required": ["elementId", "confidence"],
+}
+ELEMENT_GENERATION_CONFIG = GenerationConfig(
+    temperature=0.0,  # A lookup, not a creative task
+    max_output_tokens=256,
+    response_mime_type="application/json",
+    response_schema=ELEMENT_RESPONSE_SCHEMA,
+)
 
 
 def init_gemini(model_name: str = "gemini-2.0-flash-001"):
     """Initialize Vertex AI and Gemini model."""
-    global _gemini_model
+    global _gemini_model, _agent_model, IS_READY
     try:
         if PROJECT_ID:
-            vertexai.init(project=PROJECT_ID, location=LOCATION)
+            credentials = None
+            if SERVICE_ACCOUNT_INFO:
+                credentials = service_account.Credentials.from_service_account_info(
+                    SERVICE_ACCOUNT_INFO, scopes=["https://www.googleapis.com/auth/cloud-platform"]
+                )
+            vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=credentials)
             _gemini_model = GenerativeModel(model_name)
-            logger.info(f"Vertex AI initialized in {LOCATION} with {model_name}")
+            _agent_model = GenerativeModel(model_name, system_instruction=SYSTEM_PROMPT)
+            logger.info("Vertex AI initialized in %s with %s", LOCATION, model_name)
         else:
             logger.warning("No project ID found - Gemini disabled")
             _gemini_model = None
+            _agent_model = None
     except Exception as e:
-        logger.error(f"Failed to initialize Vertex AI: {e}")
+        logger.error("Failed to initialize Vertex AI: %s", e)
         _gemini_model = None
+        _agent_model = None
     
+    IS_READY = _gemini_model is not None and _agent_model is not None
     return _gemini_model
 
 
-def get_model():
-    """Get the initialized Gemini model."""
-    global _gemini_model
-    if _gemini_model is None:
-        return init_gemini()
-    return _gemini_model
+async def warm_up():
+    """
+    Send a one-token request so the gRPC channel and auth are set up at startup,
+    not on the user's first turn. Bounded by GENERATE_TIMEOUT so a hung call can't block startup.
+    """
+    if not IS_READY:
+        return
+    try:
+        await asyncio.wait_for(
+            _gemini_model.generate_content_async(
+                "ping",
+                generation_config=GenerationConfig(max_output_tokens=1)
+            ),
+            GENERATE_TIMEOUT,
+        )
+        logger.info("Gemini warm-up complete")
+    except Exception as e:
+        logger.warning("Gemini warm-up failed: %s", str(e) or type(e).__name__)
 
 
 async def generate_content(prompt: str, config: GenerationConfig = None, safety_settings: list = None):
-    """Generate content from Gemini model (async wrapper)."""
-    model = get_model()
-    if not model:
+    """
+    Generate content from the conversation model (async wrapper).
+    SYSTEM_PROMPT is applied by the model, so pass only the per-request prompt.
+    """
+    if not IS_READY:
         raise RuntimeError("Gemini model not initialized")
+    model = _agent_model
     
-    # Default config if not provided
+    # Defaults if not provided
     if config is None:
-        config = GenerationConfig(
-            temperature=0.3,
-            max_output_tokens=1024,
-            response_mime_type="application/json"
-        )
-    
-    # Default safety settings if not provided
+        config = DEFAULT_GENERATION_CONFIG
     if safety_settings is None:
-        safety_settings = [
-            SafetySetting(
-                category=HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
-                threshold=SafetySetting.HarmBlockThreshold.BLOCK_ONLY_HIGH,
-            ),
-            # ... other safety settings can be added here or passed in
-        ]
+        safety_settings = DEFAULT_SAFETY_SETTINGS
 
-    # Note: vertexai generates content synchronously by default in the basic SDK, 
-    # but we use generate_content_async for the async endpoint later if needed.
-    # For now, we'll keep it simple as used in main.py.
-    
-    return model.generate_content(
+    # Async call so the event loop keeps serving other requests during the round-trip
+    return await _with_retry(lambda: model.generate_content_async(
         prompt,
         generation_config=config,
         safety_settings=safety_settings
-    )
+    ))
+
+
+async def _with_retry(call):
+    """
+    Await call(), retrying rate-limit/unavailable errors with jittered exponential backoff.
+    Sleeps with asyncio.sleep so other requests keep being served meanwhile.
+    """
+    for attempt in range(MAX_RETRIES):
+        await _rate_limiter.acquire()
+        try:
+            return await call()
+        except _RETRYABLE_ERRORS as e:
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.5)
+            logger.warning("Gemini unavailable (%s), retrying in %.1fs", e, delay)
+            await asyncio.sleep(delay)
+    await _rate_limiter.acquire()
+    return await call()
+
+
+def _prompt_key(prompt: str) -> bytes:
+    return hashlib.blake2b(prompt.encode(), digest_size=16).digest()
+
+
+def get_cached_response(prompt: str) -> str | None:
+    """Get the reply text cached for this exact prompt, if still fresh."""
+    key = _prompt_key(prompt)
+    cached = _response_cache.get(key)
+    if cached is None:
+        return None
+    stored_at, text = cached
+    if time.monotonic() - stored_at > RESPONSE_CACHE_TTL:
+        del _response_cache[key]
+        return None
+    _response_cache.move_to_end(key)
+    return text
+
+
+def cache_response(prompt: str, text: str):
+    """Remember a successfully parsed reply for this prompt."""
+    key = _prompt_key(prompt)
+    _response_cache[key] = (time.monotonic(), text)
+    _response_cache.move_to_end(key)
+    if len(_response_cache) > RESPONSE_CACHE_SIZE:
+        _response_cache.popitem(last=False)
 
 
 async def generate_content_async(prompt: str):
     """Generate content asynchronously (used for element resolution)."""
-    model = get_model()
-    if not model:
+    if not IS_READY:
         raise RuntimeError("Gemini model not initialized")
     
-    return await model.generate_content_async(prompt)
+    return await _with_retry(lambda: _gemini_model.generate_content_async(
+        prompt,
+        generation_config=ELEMENT_GENERATION_CONFIG
+    ))
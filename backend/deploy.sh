@@ -53,6 +53,14 @@ if [ "$DEPLOY_CHOICE" == "1" ]; then
         exit 1
     fi
 
+    # Pin CORS to the extension origin
+    CORS_FLAGS=()
+    if [ -n "$EXTENSION_ID" ]; then
+        CORS_FLAGS=(--set-env-vars EXTENSION_ID=$EXTENSION_ID)
+    else
+        echo "Warning: EXTENSION_ID not found in .env - CORS will allow any origin"
+    fi
+
     echo "Deploying to Cloud Run..."
     gcloud run deploy $SERVICE_NAME \
         --source . \
@@ -60,7 +68,8 @@ if [ "$DEPLOY_CHOICE" == "1" ]; then
         --region $REGION \
         --allow-unauthenticated \
         --set-env-vars ELEVENLABS_API_KEY=$ELEVENLABS_API_KEY \
-        --set-env-vars GOOGLE_APPLICATION_CREDENTIALS=/app/service-account-key.json
+        --set-env-vars GOOGLE_APPLICATION_CREDENTIALS=/app/service-account-key.json \
+        "${CORS_FLAGS[@]}"
 
 elif [ "$DEPLOY_CHOICE" == "2" ]; then
     echo ""
@@ -76,6 +85,15 @@ elif [ "$DEPLOY_CHOICE" == "2" ]; then
 
     echo ""
     read -p "Enter your ElevenLabs API key: " ELEVENLABS_KEY
+    read -p "Enter your Chrome extension ID (from chrome://extensions; blank allows any origin): " EXTENSION_ID
+
+    # Pin CORS to the extension origin
+    CORS_FLAGS=()
+    if [ -n "$EXTENSION_ID" ]; then
+        CORS_FLAGS=(--update-env-vars EXTENSION_ID=$EXTENSION_ID)
+    else
+        echo "Warning: no extension ID - CORS will allow any origin"
+    fi
 
     # Create secrets
     echo "Creating secrets in Secret Manager..."
@@ -110,7 +128,8 @@ elif [ "$DEPLOY_CHOICE" == "2" ]; then
         --region $REGION \
         --allow-unauthenticated \
         --update-secrets ELEVENLABS_API_KEY=elevenlabs-api-key:latest \
-        --update-secrets GOOGLE_APPLICATION_CREDENTIALS=vertex-ai-credentials:latest
+        --update-secrets GOOGLE_APPLICATION_CREDENTIALS_JSON=vertex-ai-credentials:latest \
+        "${CORS_FLAGS[@]}"
 else
     echo "Invalid choice. Exiting."
     exit 1
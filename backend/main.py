@@ -5,7 +5,8 @@ import os
 import uvicorn
 
 if __name__ == "__main__":
-    # Use PORT environment variable for Cloud Run compatibility
+    # Use PORT environment variable for Cloud Run compatibility.
+    # loop/http "auto" pick uvloop and httptools when installed (see requirements.txt)
     port = int(os.getenv("PORT", 8000))
 
     uvicorn.run(
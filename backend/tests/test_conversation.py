@@ -0,0 +1,123 @@
+"""
+/conversation reply handling with Gemini stubbed out (no server or credentials needed).
+Run: python tests/test_conversation.py  (or pytest tests/test_conversation.py)
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.core import json
+from app.api.conversation import _to_actions
+from app.main import app
+from app.services import conversation as conv_service
+from app.services import gemini as gemini_service
+
+SAY_REPLY = {"actions": [{"type": "say", "args": {"text": "Hello"}}], "completed": True}
+CLICK_REPLY = {"actions": [{"type": "click", "args": {"elementId": "el-1"}}], "completed": False}
+
+
+class FakeGemini:
+    """Stands in for gemini_service.generate_content, counting calls."""
+
+    def __init__(self, reply: dict):
+        self.text = json.dumps(reply)
+        self.calls = 0
+
+    async def __call__(self, prompt: str):
+        self.calls += 1
+        return SimpleNamespace(text=self.text)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def _send(client: TestClient, fake: FakeGemini, transcript: str, clock: FakeClock) -> int:
+    """POST a turn through an existing fake; returns its call count afterwards."""
+    saved = (gemini_service.IS_READY, gemini_service.generate_content, gemini_service.time)
+    gemini_service.IS_READY, gemini_service.generate_content, gemini_service.time = True, fake, clock
+    try:
+        # A fresh conversation each time keeps history (and so the prompt) identical
+        assert client.post("/conversation", json={"transcript": transcript}).status_code == 200
+    finally:
+        gemini_service.IS_READY, gemini_service.generate_content, gemini_service.time = saved
+    return fake.calls
+
+
+def test_reply_cache_ttl_is_not_extended_by_hits():
+    gemini_service._response_cache.clear()
+    clock = FakeClock()
+    fake = FakeGemini(SAY_REPLY)
+    with TestClient(app) as client:
+        assert _send(client, fake, "hello there", clock) == 1
+        clock.now += 50
+        assert _send(client, fake, "hello there", clock) == 1  # Hit
+        clock.now += 50  # 100 s after the reply was stored
+        assert _send(client, fake, "hello there", clock) == 2  # Expired, despite the hit at +50
+
+
+def test_mutating_replies_are_not_cached():
+    gemini_service._response_cache.clear()
+    clock = FakeClock()
+    fake = FakeGemini(CLICK_REPLY)
+    with TestClient(app) as client:
+        assert _send(client, fake, "click the button", clock) == 1
+        assert _send(client, fake, "click the button", clock) == 2
+
+
+def test_history_store_failure_does_not_fail_the_turn():
+    async def unavailable(*args):
+        raise ConnectionError("redis down")
+
+    saved = (conv_service.get_history, conv_service.add_message)
+    conv_service.get_history = conv_service.add_message = unavailable
+    try:
+        with TestClient(app) as client:
+            assert _send(client, FakeGemini(SAY_REPLY), "history is down", FakeClock()) == 1
+    finally:
+        conv_service.get_history, conv_service.add_message = saved
+
+
+def test_well_formed_actions_are_kept():
+    actions = _to_actions([
+        {"type": "click", "args": {"elementId": "el-1"}},
+        {"type": "go_back"},  # Argument-less actions may omit args
+        {"type": "reload", "args": None},
+    ])
+    assert [(a.type, a.args) for a in actions] == [
+        ("click", {"elementId": "el-1"}), ("go_back", {}), ("reload", {}),
+    ]
+
+
+def test_malformed_actions_are_dropped():
+    actions = _to_actions([
+        {"type": "click", "args": "el-1"},  # args not an object: not coerced to {}
+        {"type": "type", "args": ["el-2", "cats"]},
+        {"args": {"elementId": "el-3"}},  # No type
+        {"type": 3},
+        "click",
+        None,
+        {"type": "say", "args": {"text": "ok"}},
+    ])
+    assert [(a.type, a.args) for a in actions] == [("say", {"text": "ok"})]
+
+
+def test_non_list_actions_are_dropped():
+    assert _to_actions(None) == []
+    assert _to_actions({"type": "click"}) == []
+    assert _to_actions("click") == []
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
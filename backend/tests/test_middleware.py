@@ -0,0 +1,69 @@
+"""
+Request body limits in app.core.middleware (no server needed).
+Run: python tests/test_middleware.py  (or pytest tests/test_middleware.py)
+"""
+import gzip
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.middleware import MAX_REQUEST_BODY, GzipRequestMiddleware, RequestSizeLimitMiddleware
+
+app = FastAPI()
+app.add_middleware(GzipRequestMiddleware)
+app.add_middleware(RequestSizeLimitMiddleware)
+
+
+@app.post("/echo")
+async def echo(request: Request):
+    return {"size": len(await request.body())}
+
+
+client = TestClient(app)
+CHUNK = b"x" * (64 * 1024)
+
+
+def _chunks(total: int):
+    """Generator body: httpx sends it with Transfer-Encoding: chunked (no Content-Length)."""
+    for _ in range(total // len(CHUNK)):
+        yield CHUNK
+
+
+def test_small_body_passes():
+    response = client.post("/echo", content=b"{}")
+    assert response.status_code == 200
+    assert response.json() == {"size": 2}
+
+
+def test_declared_oversized_body_rejected():
+    response = client.post("/echo", content=b"x" * (MAX_REQUEST_BODY + 1))
+    assert response.status_code == 413
+
+
+def test_chunked_body_within_limit_passes():
+    response = client.post("/echo", content=_chunks(MAX_REQUEST_BODY // 2))
+    assert response.status_code == 200
+    assert response.json() == {"size": MAX_REQUEST_BODY // 2}
+
+
+def test_chunked_oversized_body_rejected():
+    response = client.post("/echo", content=_chunks(MAX_REQUEST_BODY + 2 * len(CHUNK)))
+    assert response.status_code == 413
+
+
+def test_gzip_body_inflated():
+    body = gzip.compress(b'{"transcript": "hi"}')
+    response = client.post("/echo", content=body, headers={"content-encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.json() == {"size": 20}
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
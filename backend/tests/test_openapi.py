@@ -0,0 +1,56 @@
+"""
+The generated OpenAPI document is self-contained (no server needed).
+Run: python tests/test_openapi.py  (or pytest tests/test_openapi.py)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def _refs(node):
+    """Yield every $ref value in a JSON document."""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "$ref":
+                yield value
+            else:
+                yield from _refs(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _refs(item)
+
+
+def _resolve(document: dict, ref: str):
+    assert ref.startswith("#/"), f"external $ref: {ref}"
+    node = document
+    for part in ref[2:].split("/"):
+        assert isinstance(node, dict) and part in node, f"unresolved $ref: {ref}"
+        node = node[part]
+    return node
+
+
+def test_every_ref_resolves():
+    document = TestClient(app).get("/openapi.json").json()
+    refs = set(_refs(document))
+    assert refs
+    for ref in refs:
+        _resolve(document, ref)
+
+
+def test_json_body_routes_document_their_body():
+    document = TestClient(app).get("/openapi.json").json()
+    for path in ("/conversation", "/resolve-element"):
+        schema = document["paths"][path]["post"]["requestBody"]["content"]["application/json"]["schema"]
+        assert "properties" in _resolve(document, schema["$ref"])
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
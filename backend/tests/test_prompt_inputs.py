@@ -0,0 +1,122 @@
+"""
+Prompt input helpers: reply parsing, DOM limiting and the prompt budget (no server needed).
+Run: python tests/test_prompt_inputs.py  (or pytest tests/test_prompt_inputs.py)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import json
+from app.services.conversation import (
+    HISTORY_PROMPT_LIMIT, PROMPT_CHAR_BUDGET, TRUNCATION_MARKER, fit_prompt_budget,
+)
+from app.services.dom import compact_dom, limit_elements
+
+
+def _raises_decode_error(text: str) -> bool:
+    try:
+        json.extract_object(text)
+    except json.JSONDecodeError:
+        return True
+    return False
+
+
+# extract_object
+
+def test_extract_bare_object():
+    assert json.extract_object('{"actions": [], "completed": true}') == {"actions": [], "completed": True}
+
+
+def test_extract_fenced_object():
+    text = 'Here you go:\n```json\n{"actions": [{"type": "say"}]}\n```\nDone.'
+    assert json.extract_object(text) == {"actions": [{"type": "say"}]}
+
+
+def test_extract_falls_back_when_bare_parse_fails():
+    # Starts with "{" but has trailing prose: the direct parse fails, the regex slice succeeds
+    assert json.extract_object('{"completed": false} trailing') == {"completed": False}
+
+
+def test_extract_without_object_raises():
+    assert _raises_decode_error("I can't help with that.")
+    assert _raises_decode_error('{"actions": [')
+
+
+# limit_elements / compact_dom
+
+def test_limit_keeps_small_snapshots():
+    snapshot = {"elements": [{"id": "a"}, {"id": "b"}]}
+    assert limit_elements(snapshot, "anything", limit=5) is snapshot
+
+
+def test_limit_keeps_best_matches_in_page_order():
+    elements = [
+        {"id": "nav", "text": "Home"},
+        {"id": "search", "placeholder": "Search products"},
+        {"id": "footer", "text": "Contact"},
+        {"id": "button", "text": "Search"},
+    ]
+    limited = limit_elements({"url": "u", "elements": elements}, "search for products", limit=2)
+    assert limited["url"] == "u"
+    assert [e["id"] for e in limited["elements"]] == ["search", "button"]
+
+
+def test_limit_ties_keep_top_of_page():
+    elements = [{"id": str(i), "text": "item"} for i in range(5)]
+    limited = limit_elements({"elements": elements}, "unrelated", limit=3)
+    assert [e["id"] for e in limited["elements"]] == ["0", "1", "2"]
+
+
+def test_limit_ignores_non_dict_elements():
+    limited = limit_elements({"elements": ["junk", {"id": "x", "text": "buy"}, None]}, "buy", limit=1)
+    assert limited["elements"] == [{"id": "x", "text": "buy"}]
+
+
+def test_compact_drops_empty_values_only():
+    node = {"id": "a", "text": "  Hi ", "label": "", "alt": None, "checked": False, "children": [{}, {"id": "b"}]}
+    assert compact_dom(node) == {"id": "a", "text": "Hi", "checked": False, "children": [{"id": "b"}]}
+
+
+# fit_prompt_budget
+
+def _history(turns: int, size: int = 10) -> list:
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"{i:03d}" + "x" * size} for i in range(turns)]
+
+
+def test_budget_untouched_when_it_fits():
+    history_text, dom_text = fit_prompt_budget(_history(2), '{"elements": []}', 100)
+    assert dom_text == '{"elements": []}'
+    assert "000" in history_text and "001" in history_text
+
+
+def test_budget_keeps_only_recent_history():
+    history_text, _ = fit_prompt_budget(_history(HISTORY_PROMPT_LIMIT + 4), "", 0)
+    assert "003" not in history_text
+    assert f"{HISTORY_PROMPT_LIMIT + 3:03d}" in history_text
+
+
+def test_budget_drops_oldest_turns_before_the_dom():
+    dom = "d" * 100
+    turn_size = 1000
+    # Room for the DOM and about two turns
+    reserved = PROMPT_CHAR_BUDGET - len(dom) - 2 * (turn_size + 20) - 30
+    history_text, dom_text = fit_prompt_budget(_history(4, turn_size), dom, reserved)
+    assert dom_text == dom
+    assert "000" not in history_text and "003" in history_text
+    assert len(history_text) + len(dom_text) <= PROMPT_CHAR_BUDGET - reserved
+
+
+def test_budget_truncates_dom_last():
+    dom = "d" * 1000
+    reserved = PROMPT_CHAR_BUDGET - 500
+    history_text, dom_text = fit_prompt_budget(_history(3, 1000), dom, reserved)
+    assert history_text == ""
+    assert dom_text == "d" * 500 + TRUNCATION_MARKER
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
@@ -2,6 +2,7 @@
  * Page Actions - Click, type, scroll, and other DOM interactions
  */
 
+import { jsonPost } from '../../services/api';
 
 
 export interface PageActionResult {
@@ -38,16 +39,12 @@ export async function resolveElement(
 ): Promise<{ success: boolean; elementId?: string; message?: string }> {
     try {
         const backendUrl = import.meta.env.VITE_BACKEND_URL || 'http://localhost:8000';
-        const response = await fetch(`${backendUrl}/resolve-element`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                dom_context: domContext,
-                action_type: actionType,
-                action_description: description,
-                action_value: value
-            })
-        });
+        const response = await fetch(`${backendUrl}/resolve-element`, await jsonPost({
+            dom_context: domContext,
+            action_type: actionType,
+            action_description: description,
+            action_value: value
+        }));
 
         const result = await response.json();
         if (result.success && result.element_id) {
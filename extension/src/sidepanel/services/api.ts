@@ -1,5 +1,8 @@
 const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || 'http://localhost:8000';
 
+// Bodies above this size (DOM snapshots) are gzipped; the backend inflates them
+const GZIP_MIN_BYTES = 1024;
+
 interface PageContext {
     url: string;
     title: string;
@@ -36,6 +39,21 @@ export interface ConversationResponse {
     conversation_id?: string;
 }
 
+/**
+ * Build a JSON POST request, gzipping large bodies
+ */
+export async function jsonPost(payload: unknown, signal?: AbortSignal): Promise<RequestInit> {
+    const json = JSON.stringify(payload);
+    const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+    if (json.length < GZIP_MIN_BYTES) {
+        return { method: 'POST', headers, body: json, signal };
+    }
+
+    const gzipped = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+    headers['Content-Encoding'] = 'gzip';
+    return { method: 'POST', headers, body: await new Response(gzipped).arrayBuffer(), signal };
+}
+
 /**
  * Send user transcript to backend, get response + optional actions
  * @param signal - Optional AbortSignal to cancel the request
@@ -50,14 +68,7 @@ export async function sendToBackend(request: ConversationRequest, signal?: Abort
 
     console.log('[Aeyes Network] 📤 SENDING Payload:', logPayload);
 
-    const response = await fetch(`${BACKEND_URL}/conversation`, {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(request),
-        signal,
-    });
+    const response = await fetch(`${BACKEND_URL}/conversation`, await jsonPost(request, signal));
 
     if (!response.ok) {
         throw new Error(`Backend error: ${response.status}`);